@@ -4,15 +4,48 @@ import time
 import argparse
 import urllib.parse
 import csv
+import itertools
 import re
-from playwright.sync_api import sync_playwright, TimeoutError
+import asyncio
+from functools import lru_cache
+from playwright.async_api import async_playwright, TimeoutError
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Reused for compact output when orjson isn't installed
+COMPACT_JSON_ENCODER = json.JSONEncoder(separators=(',', ':'))
 
 # Configuration parameters
 PAGE_LOAD_TIMEOUT = 15000
 WAIT_TIME = 2
+VIEWPORT = {'width': 1280, 'height': 800}
+HEADLESS = True
+BROWSER_ARGS = ['--disable-gpu', '--disable-dev-shm-usage']
+MAX_CONCURRENT_SITES = 8
+SITE_START_STAGGER = 0.1
+POLITENESS_DELAY = 1
+CONSENT_BANNER_WAIT = 3
+
+# Font and media files are never inspected by the crawler. They are blocked by
+# URL in the browser, since routing every request through Python to abort them
+# would also disable the HTTP cache. Images are only blocked on request, since
+# tracking pixels are images and set third-party cookies.
+BLOCKED_FILE_EXTENSIONS = ('woff', 'woff2', 'ttf', 'otf', 'eot',
+                           'mp4', 'webm', 'ogg', 'mp3', 'm4a', 'wav')
+BLOCKED_URL_PATTERNS = [
+    pattern
+    for extension in BLOCKED_FILE_EXTENSIONS
+    for pattern in (f'*.{extension}', f'*.{extension}?*')
+]
+
+# Content types treated as crawlable web pages
+HTML_CONTENT_TYPES = frozenset({'text/html', 'application/xhtml+xml'})
 
 # Common tracking domains for rule-based detection
-TRACKING_DOMAINS = [
+TRACKING_DOMAINS = (
     'google-analytics.com',
     'googletagmanager.com',
     'doubleclick.net',
@@ -26,10 +59,10 @@ TRACKING_DOMAINS = [
     'ads.linkedin.com',
     'adroll.com',
     'bing.com/bat',
-]
+)
 
 # Tracking-related keywords in URL paths
-TRACKING_PATH_KEYWORDS = [
+TRACKING_PATH_KEYWORDS = (
     '/analytics',
     '/collect',
     '/pixel',
@@ -40,10 +73,10 @@ TRACKING_PATH_KEYWORDS = [
     '/conversion',
     '/impression',
     '/stats'
-]
+)
 
 # Tracking-related query parameters
-TRACKING_QUERY_PARAMS = [
+TRACKING_QUERY_PARAMS = (
     'fbclid',
     'utm_',
     'cid',
@@ -54,165 +87,307 @@ TRACKING_QUERY_PARAMS = [
     'tracking_id',
     'visitor_id',
     'msclkid',
+)
+
+# Ad-related subdomains, e.g. ads.example.com
+AD_SUBDOMAINS = ('ad', 'ads', 'adservice', 'adserver', 'adtech', 'advertising')
+
+# Each rule compiled into one alternation so a URL is checked in a single scan
+TRACKING_DOMAIN_RE = re.compile('|'.join(
+    [re.escape(domain) for domain in TRACKING_DOMAINS] +
+    [re.escape(f'{subdomain}.') for subdomain in AD_SUBDOMAINS]
+))
+TRACKING_PATH_RE = re.compile('|'.join(re.escape(keyword) for keyword in TRACKING_PATH_KEYWORDS))
+TRACKING_QUERY_RE = re.compile(
+    '(?:^|&)(?:' + '|'.join(re.escape(param) for param in TRACKING_QUERY_PARAMS) + ')'
+)
+
+# Common consent banner accept buttons, in order of preference
+CONSENT_ACCEPT_SELECTORS = [
+    "button:text-is('Accept')", 
+    "button:text-is('Accept all')",
+    "button:text-is('I agree')",
+    "button:text-is('Allow')",
+    "#onetrust-accept-btn-handler",
+    "[id*='accept']",
+    "button:has-text('Accept')",
+    "button:has-text('Accept cookies')",
+    "button:has-text('I accept')",
+    ".consent-banner button:first-child",
+    ".agree-button",
+    "[aria-label*='consent']",
+    "[aria-label*='cookie']",
+    "button:has-text('Agree')",
+    "[data-testid='GDPR-accept']",
+    "#didomi-notice-agree-button",
+    ".css-47sehv",  # CNN specific
+    ".fc-button-label",  # Common for many sites
 ]
 
+# Returns the indexes of the selectors that match a visible element on the page.
+# Playwright's :text-is() / :has-text() are emulated by matching textContent.
+# Layout is flushed once up front so the per-element rect checks stay cheap,
+# and getComputedStyle is only called for elements that have a box. Each CSS
+# part is queried once, so the text selectors share a single 'button' query
+# and each button's text is normalized once.
+CONSENT_PROBE_JS = '''(selectors) => {
+    const matches = [];
+    const isVisible = (el) =>
+        el.getClientRects().length > 0 && getComputedStyle(el).visibility !== 'hidden';
+    // Search open shadow roots too, like Playwright's CSS engine, since some
+    // consent platforms render their banner inside one
+    const roots = [document];
+    for (let i = 0; i < roots.length; i++) {
+        for (const el of roots[i].querySelectorAll('*')) {
+            if (el.shadowRoot) roots.push(el.shadowRoot);
+        }
+    }
+    const cache = new Map();
+    const query = (css) => {
+        if (!cache.has(css)) {
+            try {
+                cache.set(css, roots.flatMap(root => Array.from(root.querySelectorAll(css))));
+            } catch (e) {
+                cache.set(css, []);
+            }
+        }
+        return cache.get(css);
+    };
+    const texts = new Map();
+    const textOf = (el) => {
+        if (!texts.has(el)) texts.set(el, el.textContent.replace(/\\s+/g, ' ').trim());
+        return texts.get(el);
+    };
+    if (document.body) document.body.getBoundingClientRect();
+    selectors.forEach((selector, i) => {
+        const textMatch = selector.match(/^(.*):(text-is|has-text)\\('(.*)'\\)$/);
+        const elements = query(textMatch ? textMatch[1] : selector);
+        for (const el of elements) {
+            if (textMatch) {
+                const text = textOf(el);
+                const wanted = textMatch[3];
+                const found = textMatch[2] === 'text-is'
+                    ? text === wanted
+                    : text.toLowerCase().includes(wanted.toLowerCase());
+                if (!found) continue;
+            }
+            if (!isVisible(el)) continue;
+            matches.push(i);
+            return;
+        }
+    });
+    return matches;
+}'''
+
+# Returns up to two visible same-domain page links, given [domain, page url].
+# Anchors are scanned in the page and the loop stops at the second hit, so only
+# those links cross back to Python and none of them need re-parsing there.
+INTERNAL_LINKS_JS = '''([domain, url]) => {
+    const NON_HTML_PATH = /\\.(pdf|zip|jpe?g|png|gif|svg|webp|mp3|mp4|docx?|xlsx?|pptx?)$/i;
+    const links = [];
+    for (const a of document.querySelectorAll('a[href]')) {
+        const href = a.href;
+        if (!(a.protocol || '').startsWith('http')) continue;
+        if (a.host.replace(/^www\\./, '') !== domain) continue;
+        // Skip the homepage, fragment URLs and non-HTML documents
+        if (href === url || href === url + '/' || href.includes('#')) continue;
+        if (NON_HTML_PATH.test(a.pathname)) continue;
+        if (a.getClientRects().length === 0) continue;
+        links.push(href);
+        if (links.length >= 2) break;
+    }
+    return links;
+}'''
+
+@lru_cache(maxsize=4096)
+def parse_url(url):
+    """Split a URL into its components, caching the result."""
+    return urllib.parse.urlsplit(url)
+
+@lru_cache(maxsize=4096)
 def get_domain(url):
     """Extract the domain from a URL."""
-    parsed_url = urllib.parse.urlparse(url)
-    domain = parsed_url.netloc
-    if domain.startswith('www.'):
-        domain = domain[4:]
-    return domain
+    return parse_url(url).netloc.removeprefix('www.')
 
-def is_tracking_request(url):
+def is_tracking_request(parsed_url):
     """
-    Determine if a URL is a tracking request based on three rules:
+    Determine if a parsed URL is a tracking request based on three rules:
     1. Domain is a known tracker
     2. URL path contains tracking keywords
     3. Query parameters suggest tracking
     """
-    parsed_url = urllib.parse.urlparse(url)
-    domain = parsed_url.netloc
-    path = parsed_url.path.lower()
-    query = parsed_url.query
-    
-    # Rule 1: Check against known tracker domains
-    for tracker_domain in TRACKING_DOMAINS:
-        if tracker_domain in domain:
-            return True
+    # Rule 1: Check against known tracker domains and ad-related subdomains
+    if TRACKING_DOMAIN_RE.search(parsed_url.netloc):
+        return True
     
     # Rule 2: Check URL path for tracking-related keywords
-    for keyword in TRACKING_PATH_KEYWORDS:
-        if keyword in path:
-            return True
+    if TRACKING_PATH_RE.search(parsed_url.path.lower()):
+        return True
     
     # Rule 3: Check for tracking-related query parameters
-    query_params = query.split('&')
-    for param in query_params:
-        for tracking_param in TRACKING_QUERY_PARAMS:
-            if param.startswith(tracking_param):
-                return True
-    
-    # Additional check for ad-related subdomains
-    ad_subdomains = ['ad', 'ads', 'adservice', 'adserver', 'adtech', 'advertising']
-    for subdomain in ad_subdomains:
-        if f'{subdomain}.' in domain:
-            return True
+    return TRACKING_QUERY_RE.search(parsed_url.query) is not None
+
+def is_first_party(domain, main_domain):
+    """Check whether a request or cookie domain is main_domain or one of its subdomains."""
+    domain = domain.lstrip('.')
+    return domain == main_domain or domain.endswith('.' + main_domain)
+
+def classify_request(url, main_domain):
+    """Return (domain, is_tracking) for a third-party request URL, or None for first-party ones."""
+    req_domain = get_domain(url)
+    if not req_domain or is_first_party(req_domain, main_domain):
+        return None
+    return req_domain, is_tracking_request(parse_url(url))
+
+async def new_context(browser, block_images=False):
+    """Create a desktop-sized browser context, optionally aborting image requests."""
+    context = await browser.new_context(viewport=VIEWPORT)
     
-    return False
+    if block_images:
+        async def block_image(route):
+            if route.request.resource_type == 'image':
+                await route.abort()
+            else:
+                await route.continue_()
+        
+        await context.route("**/*", block_image)
+    return context
+
+async def block_file_downloads(context, page):
+    """Block font and media downloads for a page by URL, without intercepting requests."""
+    cdp = await context.new_cdp_session(page)
+    await cdp.send('Network.enable')
+    await cdp.send('Network.setBlockedURLs', {'urls': BLOCKED_URL_PATTERNS})
+
+async def wait_for_network_idle(page, timeout=WAIT_TIME):
+    """Wait until the page's network is quiet, giving up after timeout seconds."""
+    try:
+        await page.wait_for_load_state('networkidle', timeout=timeout * 1000)
+    except TimeoutError:
+        pass
+
+async def wait_for_consent_banner(page, timeout=CONSENT_BANNER_WAIT):
+    """Wait until an accept button is visible, giving up after timeout seconds."""
+    try:
+        await page.wait_for_function(
+            f"(selectors) => ({CONSENT_PROBE_JS})(selectors).length > 0",
+            arg=CONSENT_ACCEPT_SELECTORS,
+            timeout=timeout * 1000,
+            polling=250
+        )
+        return True
+    except TimeoutError:
+        return False
 
-def handle_consent_banner(page, consent_mode):
+async def handle_consent_banner(page, consent_mode):
     """Attempt to handle consent banners using common selectors."""
     if consent_mode != "accept":
         return "no-consent-mode"
     
-    # Common accept buttons
-    accept_selectors = [
-        "button:text-is('Accept')", 
-        "button:text-is('Accept all')",
-        "button:text-is('I agree')",
-        "button:text-is('Allow')",
-        "#onetrust-accept-btn-handler",
-        "[id*='accept']",
-        "button:has-text('Accept')",
-        "button:has-text('Accept cookies')",
-        "button:has-text('I accept')",
-        ".consent-banner button:first-child",
-        ".agree-button",
-        "[aria-label*='consent']",
-        "[aria-label*='cookie']",
-        "button:has-text('Agree')",
-        "[data-testid='GDPR-accept']",
-        "#didomi-notice-agree-button",
-        ".css-47sehv",  # CNN specific
-        ".fc-button-label",  # Common for many sites
-    ]
+    # Find every matching selector in one round-trip instead of one query per selector
+    try:
+        matches = await page.evaluate(CONSENT_PROBE_JS, CONSENT_ACCEPT_SELECTORS)
+    except Exception:
+        return "no-banner"
     
-    for selector in accept_selectors:
+    for index in matches:
         try:
-            if page.query_selector(selector):
-                page.click(selector, timeout=1500)
-                return "accepted"
-        except:
+            # Target the visible match, as the probe did, not the selector's first match
+            await page.click(f"{CONSENT_ACCEPT_SELECTORS[index]} >> visible=true", timeout=1500)
+            return "accepted"
+        except Exception:
             continue
     
     return "no-banner"
 
-def crawl_page(url, browser, consent_mode="accept", track_cookies_before_consent=False):
+async def crawl_page(url, context, consent_mode="accept", track_cookies_before_consent=False):
     """
-    Crawl a page and collect privacy metrics.
+    Crawl a page in the given browser context and collect privacy metrics.
     If track_cookies_before_consent is True, will first measure cookies before consent interaction.
     """
-    # Create context with viewport size to ensure desktop layout
-    context = browser.new_context(
-        viewport={'width': 1280, 'height': 800}
-    )
-    
     # Tracking data structures
     third_party_domains = set()
     tracking_requests = set()
     main_domain = get_domain(url)
     
     # Cookie tracking
-    cookies_before_consent = []
-    third_party_cookies_before_consent = []
+    num_third_party_cookies_before_consent = 0
+
+    # Classification per request URL, since pages re-request the same URLs many times
+    seen_requests = {}
 
     def request_monitor(request):
-        req_domain = get_domain(request.url)
-        if req_domain != main_domain and req_domain:
+        req_url = request.url
+        if req_url in seen_requests:
+            classified = seen_requests[req_url]
+        else:
+            classified = seen_requests[req_url] = classify_request(req_url, main_domain)
+        if classified:
+            req_domain, is_tracking = classified
             third_party_domains.add(req_domain)
-            if is_tracking_request(request.url):
+            if is_tracking:
                 tracking_requests.add(req_domain)
 
-    context.on("request", request_monitor)
-    page = context.new_page()
+    page = await context.new_page()
+    page.on("request", request_monitor)
 
     print(f"\n=== Crawling {url} ===")
 
     try:
+        await block_file_downloads(context, page)
+        
         # Go to URL with timeout
-        page.goto(url, timeout=PAGE_LOAD_TIMEOUT, wait_until='domcontentloaded')
-        time.sleep(WAIT_TIME)
+        response = await page.goto(url, timeout=PAGE_LOAD_TIMEOUT, wait_until='domcontentloaded')
+        
+        # Don't spend settle and consent waits on documents that aren't web pages
+        content_type = response.headers.get('content-type', '').split(';')[0].strip().lower() if response else ''
+        if content_type and content_type not in HTML_CONTENT_TYPES:
+            print(f"    [!] Skipping {url}: not an HTML page ({content_type})")
+            return {
+                "url": url,
+                "error": f"Not an HTML page ({content_type})",
+                "internal_links": []
+            }
+        
+        await wait_for_network_idle(page)
         
         # If tracking pre-consent cookies, get cookies before banner interaction
         if track_cookies_before_consent:
-            cookies_before_consent = context.cookies()
-            third_party_cookies_before_consent = [
-                cookie for cookie in cookies_before_consent 
-                if not cookie["domain"].endswith(main_domain)
-            ]
+            # Only the counts are needed, so don't build filtered cookie lists
+            cookies_before_consent = await context.cookies()
+            num_third_party_cookies_before_consent = sum(
+                1 for cookie in cookies_before_consent
+                if not is_first_party(cookie["domain"], main_domain)
+            )
             
             print(f"    Pre-consent cookies: {len(cookies_before_consent)}")
-            print(f"    Pre-consent 3P cookies: {len(third_party_cookies_before_consent)}")
+            print(f"    Pre-consent 3P cookies: {num_third_party_cookies_before_consent}")
 
         # Handle consent banner with multiple attempts and scrolling
         consent_result = "no-banner"
         if consent_mode == "accept":
             # First try to find banner at current position
-            initial_result = handle_consent_banner(page, consent_mode)
+            initial_result = await handle_consent_banner(page, consent_mode)
             if initial_result == "accepted":
                 consent_result = initial_result
             else:
-                # Try scrolling down a bit to reveal banners at bottom
-                page.evaluate("window.scrollTo(0, 300)")
-                time.sleep(1)
-                scroll_result = handle_consent_banner(page, consent_mode)
-                if scroll_result == "accepted":
-                    consent_result = scroll_result
-                else:
-                    # Some sites only show banner after a delay
-                    time.sleep(2)
-                    delayed_result = handle_consent_banner(page, consent_mode)
+                # Try scrolling down a bit to reveal banners at bottom, and since some
+                # sites only show the banner after a delay, wait for one to appear
+                await page.evaluate("window.scrollTo(0, 300)")
+                if await wait_for_consent_banner(page):
+                    delayed_result = await handle_consent_banner(page, consent_mode)
                     if delayed_result == "accepted":
                         consent_result = delayed_result
         else:
             consent_result = "no-consent-mode"
             
-        time.sleep(WAIT_TIME)
+        # Give trackers loaded by accepting consent a chance to fire; the click starts
+        # no navigation, so a networkidle wait would return before they load
+        if consent_result == "accepted":
+            await asyncio.sleep(WAIT_TIME)
 
         # Get cookies and domains after consent interaction
-        all_cookies = context.cookies()
-        num_cookies = len(all_cookies)
+        num_cookies = len(await context.cookies())
         num_thirdparty = len(third_party_domains)
         num_tracking = len(tracking_requests)
         
@@ -222,19 +397,7 @@ def crawl_page(url, browser, consent_mode="accept", track_cookies_before_consent
         # Get internal links
         internal_links = []
         try:
-            links = page.evaluate('''() => {
-                const links = Array.from(document.querySelectorAll('a[href]'));
-                return links.map(a => a.href).filter(href => href.startsWith('http'));
-            }''')
-            
-            base_domain = get_domain(url)
-            for link in links:
-                if get_domain(link) == base_domain:
-                    # Skip the homepage or fragment-only URLs
-                    if link != url and link != url + "/" and "#" not in link:
-                        internal_links.append(link)
-                        if len(internal_links) >= 2:
-                            break
+            internal_links = await page.evaluate(INTERNAL_LINKS_JS, [main_domain, url])
         except Exception as e:
             print(f"    [!] Error getting links: {str(e)[:100]}")
         
@@ -247,7 +410,7 @@ def crawl_page(url, browser, consent_mode="accept", track_cookies_before_consent
             "tracking_domains": list(tracking_requests),
             "third_party_domains": list(third_party_domains),
             "internal_links": internal_links[:2],
-            "pre_consent_cookies": len(third_party_cookies_before_consent) if track_cookies_before_consent else 0,
+            "pre_consent_cookies": num_third_party_cookies_before_consent,
         }
 
         return result
@@ -260,67 +423,122 @@ def crawl_page(url, browser, consent_mode="accept", track_cookies_before_consent
             "internal_links": []
         }
     finally:
-        context.close()
+        await page.close()
 
 def read_site_list(file_path):
-    """Read sites from a file."""
+    """Yield sites from a file, one per non-empty line."""
     with open(file_path, 'r') as f:
-        sites = [line.strip() for line in f if line.strip()]
-    if len(sites) > 10:
-        print(f"[!] Found {len(sites)} sites; limiting to 10 as per instructions.")
-        sites = sites[:10]
-    return sites
+        for line in f:
+            site = line.strip()
+            if site:
+                yield site
 
-def privacy_analysis(site_list_path, consent_mode="accept"):
-    """Analyze sites and calculate privacy scores."""
-    os.makedirs('output', exist_ok=True)
+async def crawl_site(site, browser, consent_mode="accept", block_images=False):
+    """Crawl a site's homepage and up to 2 internal pages."""
+    site_data = {
+        "site": site,
+        "pages": []
+    }
+    
+    # One context serves every page of the site
+    context = await new_context(browser, block_images)
+    try:
+        # 1. Crawl the homepage, snapshotting cookies before touching the consent banner
+        home_result = await crawl_page(
+            url=site, 
+            context=context, 
+            consent_mode=consent_mode, 
+            track_cookies_before_consent=True
+        )
+        site_data["pages"].append(home_result)
+        
+        # 2. Crawl up to 2 internal pages
+        internal_links = home_result.get("internal_links", [])[:2]
+        for i, internal_link in enumerate(internal_links, 1):
+            print(f"\n--- Crawling internal page {i}: {internal_link}")
+            internal_result = await crawl_page(url=internal_link, context=context, consent_mode=consent_mode)
+            site_data["pages"].append(internal_result)
+    finally:
+        await context.close()
+    
+    # 3. Calculate site metrics
+    site_data["metrics"] = calculate_site_metrics(site_data["pages"])
+    
+    return site_data
+
+async def crawl_sites(sites, consent_mode="accept", workers=MAX_CONCURRENT_SITES,
+                      politeness_delay=POLITENESS_DELAY, block_images=False):
+    """
+    Crawl sites with a pool of workers sharing one browser.
+    Sites are pulled from the iterable as workers free up, and repeat visits
+    to a domain are spaced at least politeness_delay seconds apart.
+    """
+    if workers < 1:
+        raise ValueError("workers must be at least 1")
+    
+    queue = asyncio.Queue(maxsize=workers * 2)
+    site_results = {}
+    domain_locks = {}
+    last_visit = {}
     
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=False)
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=HEADLESS, args=BROWSER_ARGS)
+        
+        async def worker(worker_id):
+            # Stagger start times so the first batch doesn't hit the network in one burst
+            await asyncio.sleep(worker_id * SITE_START_STAGGER)
+            
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                index, site, domain = item
+                
+                # Only one site per domain in flight, to stay polite to each host
+                domain_lock = domain_locks.setdefault(domain, asyncio.Lock())
+                async with domain_lock:
+                    elapsed = time.monotonic() - last_visit.get(domain, float('-inf'))
+                    if elapsed < politeness_delay:
+                        await asyncio.sleep(politeness_delay - elapsed)
+                    try:
+                        site_results[index] = await crawl_site(site, browser, consent_mode, block_images)
+                    except Exception as e:
+                        print(f"[!] Error crawling site {site}: {str(e)[:150]}")
+                    last_visit[domain] = time.monotonic()
         
-        sites = read_site_list(site_list_path)
-        site_results = []
+        tasks = [asyncio.create_task(worker(i)) for i in range(workers)]
         
-        for site in sites:
+        for index, site in enumerate(sites):
             if not site.startswith("http"):
                 site = "https://" + site
-                
-            site_data = {
-                "site": site,
-                "pages": []
-            }
-            
-            # 1. Test homepage first without interacting with consent banner
-            print(f"\n--- First checking pre-consent cookies for {site} ---")
-            home_pre_consent = crawl_page(
-                url=site, 
-                browser=browser, 
-                consent_mode="none", 
-                track_cookies_before_consent=True
-            )
-            
-            # 2. Crawl the homepage normally
-            home_result = crawl_page(url=site, browser=browser, consent_mode=consent_mode)
-            
-            # Add pre-consent cookie data to the result
-            home_result["pre_consent_cookies"] = home_pre_consent.get("pre_consent_cookies", 0)
-            site_data["pages"].append(home_result)
-            
-            # 3. Crawl up to 2 internal pages
-            internal_links = home_result.get("internal_links", [])[:2]
-            for i, internal_link in enumerate(internal_links, 1):
-                print(f"\n--- Crawling internal page {i}: {internal_link}")
-                internal_result = crawl_page(url=internal_link, browser=browser, consent_mode=consent_mode)
-                site_data["pages"].append(internal_result)
-            
-            # 4. Calculate site metrics
-            site_data["metrics"] = calculate_site_metrics(site_data["pages"])
-            site_results.append(site_data)
-            
-            # Short delay between sites
-            time.sleep(1)
+            # Skip malformed entries here so they can't take down a worker
+            try:
+                domain = get_domain(site)
+            except ValueError as e:
+                print(f"[!] Skipping invalid site {site}: {e}")
+                continue
+            await queue.put((index, site, domain))
+        for _ in tasks:
+            await queue.put(None)
         
-        browser.close()
+        await asyncio.gather(*tasks)
+        await browser.close()
+    
+    # Keep results in site list order
+    return [site_results[i] for i in sorted(site_results)]
+
+def privacy_analysis(site_list_path, consent_mode="accept", pretty=False, max_sites=None,
+                     workers=MAX_CONCURRENT_SITES, politeness_delay=POLITENESS_DELAY,
+                     block_images=False):
+    """Analyze sites and calculate privacy scores."""
+    os.makedirs('output', exist_ok=True)
+    
+    sites = read_site_list(site_list_path)
+    if max_sites is not None:
+        sites = itertools.islice(sites, max_sites)
+    site_results = asyncio.run(
+        crawl_sites(sites, consent_mode, workers, politeness_delay, block_images)
+    )
     
     # Calculate privacy scores
     print("\nCalculating privacy scores...")
@@ -337,7 +555,7 @@ def privacy_analysis(site_list_path, consent_mode="accept"):
               f"Has banner: {site_data['metrics']['has_banner']}")
     
     # Save results
-    save_privacy_results(ranked_sites)
+    save_privacy_results(ranked_sites, pretty=pretty)
     
     return ranked_sites
 
@@ -436,12 +654,12 @@ def calculate_privacy_scores(site_results):
             }
         })
     
-    # Sort by privacy score (higher is better)
-    ranked_sites = sorted(scored_sites, key=lambda x: x["privacy_score"], reverse=True)
+    # Sort by privacy score (higher is better), in place since the list is ours
+    scored_sites.sort(key=lambda x: x["privacy_score"], reverse=True)
     
-    return ranked_sites
+    return scored_sites
 
-def save_privacy_results(ranked_sites):
+def save_privacy_results(ranked_sites, pretty=False):
     """Save privacy results to CSV and JSON files."""
     # Save to CSV
     csv_file = "output/privacy_ranking.csv"
@@ -455,8 +673,8 @@ def save_privacy_results(ranked_sites):
         ])
         
         # Write data
-        for i, site in enumerate(ranked_sites, 1):
-            writer.writerow([
+        writer.writerows(
+            [
                 i,
                 site["site"],
                 f"{site['privacy_score']:.2f}",
@@ -465,12 +683,20 @@ def save_privacy_results(ranked_sites):
                 site["metrics"]["cookie_count"],
                 site["metrics"]["pre_consent_cookies"],
                 site["metrics"]["has_banner"]
-            ])
+            ]
+            for i, site in enumerate(ranked_sites, 1)
+        )
     
-    # Save detailed results to JSON
+    # Save detailed results to JSON, serialized up front so it goes out in one write
     json_file = "output/privacy_analysis_results.json"
-    with open(json_file, "w") as f:
-        json.dump(ranked_sites, f, indent=2)
+    if orjson is not None:
+        data = orjson.dumps(ranked_sites, option=orjson.OPT_INDENT_2 if pretty else 0)
+    elif pretty:
+        data = json.dumps(ranked_sites, indent=2).encode()
+    else:
+        data = COMPACT_JSON_ENCODER.encode(ranked_sites).encode()
+    with open(json_file, "wb") as f:
+        f.write(data)
     
     print(f"\nResults saved to {csv_file} and {json_file}")
 
@@ -482,14 +708,35 @@ if __name__ == "__main__":
                         help='How to handle consent banners.')
     parser.add_argument('--privacy_analysis', action='store_true',
                         help='Run privacy analysis')
+    parser.add_argument('--pretty', action='store_true',
+                        help='Indent the JSON results file.')
+    parser.add_argument('--max_sites', type=int, default=None,
+                        help='Crawl at most this many sites from the list.')
+    parser.add_argument('--workers', type=int, default=MAX_CONCURRENT_SITES,
+                        help='Number of sites to crawl concurrently.')
+    parser.add_argument('--politeness_ms', type=int, default=POLITENESS_DELAY * 1000,
+                        help='Minimum delay between visits to the same domain, in milliseconds.')
+    parser.add_argument('--block_images', action='store_true',
+                        help='Also block images. Faster, but drops cookies set by tracking pixels.')
     
     args = parser.parse_args()
+    if args.workers < 1:
+        parser.error('--workers must be at least 1')
+    if args.max_sites is not None and args.max_sites < 0:
+        parser.error('--max_sites must be non-negative')
+    if args.politeness_ms < 0:
+        parser.error('--politeness_ms must be non-negative')
     
     # Run the analysis
     if args.privacy_analysis:
         privacy_analysis(
             site_list_path=args.site_list,
-            consent_mode=args.consent_mode
+            consent_mode=args.consent_mode,
+            pretty=args.pretty,
+            max_sites=args.max_sites,
+            workers=args.workers,
+            politeness_delay=args.politeness_ms / 1000,
+            block_images=args.block_images
         )
     else:
         print("Please use --privacy_analysis flag to run the required in-lab analysis.")
\ No newline at end of file